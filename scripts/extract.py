@@ -4,12 +4,17 @@
 import os
 import re
 import sys
+import atexit
 import shutil
 import logging
 import argparse
-from pathlib import Path
+import multiprocessing
+import tempfile
 import traceback
-from typing import Dict, List, Optional, Tuple
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
 
 # PDF processing
 import pdfplumber
@@ -19,6 +24,13 @@ from pdf2image import convert_from_path
 import pytesseract
 from PIL import Image
 
+# In-process Tesseract API (no tesseract subprocess per page)
+try:
+    from tesserocr import PyTessBaseAPI
+    TESSEROCR_INSTALLED = True
+except ImportError:
+    TESSEROCR_INSTALLED = False
+
 # Word documents
 import docx2txt
 
@@ -41,52 +53,262 @@ try:
 except ImportError:
     OFFICE_INSTALLED = False
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler("extraction.log", mode='w')
-    ]
-)
 logger = logging.getLogger()
 
+# Processes used to OCR the pages of a single scanned PDF (Tesseract already
+# runs ~4 threads per process)
+OCR_PAGE_WORKERS = max(1, (os.cpu_count() or 1) // 4)
+
+# Resolution used to render scanned PDF pages, and maximum image side (in
+# pixels) passed to OCR (~250 DPI for an A4 page)
+OCR_DPI = 200
+OCR_MAX_IMAGE_SIZE = 3000
+
+# Pages of a scanned PDF rendered (and OCRed by a single tesseract run when
+# tesserocr is not available) together
+OCR_BATCH_PAGES = 8
+
+# A PDF without text on its first pages is considered scanned
+SCANNED_PDF_PROBE_PAGES = 2
+
+# Write buffer size for the output text files
+OUTPUT_BUFFER_SIZE = 1 << 20
+
+# Permissions mask applied to new files (os.umask can only be read by setting it)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+# Tesseract API and Office applications of the current process, created on
+# first use
+_TESS_API = None
+_WORD_APP = None
+_POWERPOINT_APP = None
+
+# WordprocessingML elements read from .docx files
+_W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_W_TEXT = _W_NS + 't'
+_W_TAB = _W_NS + 'tab'
+_W_PARAGRAPH = _W_NS + 'p'
+_W_BREAKS = frozenset({_W_NS + 'br', _W_NS + 'cr'})
+
+# Patterns used by clean_text
+_RE_NL = re.compile(r'\n\s*\n+')
+_RE_CTRL = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]')
+# Page numbers on separate lines, or "Page X" / "Page X of Y". Both start with
+# one of [\nPp], which lets the regex engine skip quickly to candidate positions
+_RE_PAGES = re.compile(r'[\nPp](?:(?<=\n)(\s*\d+\s*\n)|(?<=\b[Pp])age\s*\d+(?:\s*of\s*\d+)?\b)')
+
+def setup_logging(log_file: str = "extraction.log") -> None:
+    """Set up logging to the console and to the given log file"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler(log_file, mode='w')
+        ],
+        force=True
+    )
+
+def init_worker(file_exts: frozenset = frozenset()) -> None:
+    """Initialize a worker process (one log file per process to avoid contention)"""
+    # Pool workers are named "...PoolWorker-<index>", so each run overwrites
+    # the log files of the previous one
+    worker_index = multiprocessing.current_process().name.rsplit('-', 1)[-1]
+    setup_logging(f"extraction_worker{worker_index}.log")
+    
+    # Start the OCR engine and Office applications needed for the batch once
+    # per worker, rather than on the first file of each type
+    try:
+        if not file_exts.isdisjoint(OCR_EXTENSIONS):
+            get_tesseract_api()
+        if OFFICE_INSTALLED and '.doc' in file_exts:
+            get_word_app()
+        if OFFICE_INSTALLED and '.ppt' in file_exts:
+            get_powerpoint_app()
+    except Exception as e:
+        logger.warning(f"Worker warm-up failed: {str(e)}")
+
+# Default input and output directories
+DEFAULT_INPUT_DIR = "C:/Users/INFO STOCK 2022/OneDrive/Bureau/Project Medecine/Annales"
+DEFAULT_OUTPUT_DIR = "C:/Users/INFO STOCK 2022/OneDrive/Bureau/S6/Textes_Extraits_Annales"
+
 def setup_argparse() -> argparse.Namespace:
     """Set up command line arguments"""
     parser = argparse.ArgumentParser(description="Extract text from document files")
-    parser.add_argument("input_dir", type=str, help="Input directory with documents")
-    parser.add_argument("output_dir", type=str, help="Output directory for extracted text")
+    parser.add_argument("input_dir", type=str, nargs="?", default=DEFAULT_INPUT_DIR,
+                        help="Input directory with documents")
+    parser.add_argument("output_dir", type=str, nargs="?", default=DEFAULT_OUTPUT_DIR,
+                        help="Output directory for extracted text")
+    parser.add_argument("--force", action="store_true",
+                        help="Reprocess files whose output is already up to date")
     return parser.parse_args()
 
+def get_tesseract_api() -> Optional["PyTessBaseAPI"]:
+    """Get the Tesseract API of the current process (language models are loaded once),
+    or None if tesserocr is not usable"""
+    global _TESS_API, TESSEROCR_INSTALLED
+    if _TESS_API is None and TESSEROCR_INSTALLED:
+        try:
+            _TESS_API = PyTessBaseAPI(lang='fra+eng')
+        except Exception as e:
+            # e.g. language data missing from tesserocr's tessdata path, use
+            # pytesseract for the rest of the run
+            logger.warning(f"Cannot start tesserocr, using pytesseract instead: {str(e)}")
+            TESSEROCR_INSTALLED = False
+            return None
+        atexit.register(_TESS_API.End)
+    return _TESS_API
+
+def ocr_image(img: Image.Image) -> str:
+    """Extract text from a PIL image using OCR"""
+    api = get_tesseract_api()
+    if api is not None:
+        api.SetImage(img)
+        return api.GetUTF8Text()
+    return pytesseract.image_to_string(img, lang='fra+eng')
+
+def get_word_app():
+    """Get the Word application of the current process (started once)"""
+    global _WORD_APP
+    if _WORD_APP is None:
+        _WORD_APP = win32com.client.Dispatch("Word.Application")
+        _WORD_APP.Visible = False
+    return _WORD_APP
+
+def quit_word_app() -> None:
+    """Quit the Word application of the current process, if any"""
+    global _WORD_APP
+    if _WORD_APP is not None:
+        try:
+            _WORD_APP.Quit()
+        except Exception:
+            pass  # Word already crashed or was closed
+        _WORD_APP = None
+
+def get_powerpoint_app():
+    """Get the PowerPoint application (attached once per process, PowerPoint is a
+    single instance shared by all the worker processes)"""
+    global _POWERPOINT_APP
+    if _POWERPOINT_APP is None:
+        _POWERPOINT_APP = win32com.client.Dispatch("PowerPoint.Application")
+    return _POWERPOINT_APP
+
+def reset_powerpoint_app() -> None:
+    """Drop the PowerPoint application of the current process, so that the next
+    file attaches again (or starts a new one if PowerPoint crashed)"""
+    global _POWERPOINT_APP
+    _POWERPOINT_APP = None
+
+def quit_powerpoint_app() -> None:
+    """Quit the PowerPoint application unless other processes still use it"""
+    global _POWERPOINT_APP
+    if _POWERPOINT_APP is not None:
+        try:
+            if _POWERPOINT_APP.Presentations.Count == 0:
+                _POWERPOINT_APP.Quit()
+        except Exception:
+            pass  # PowerPoint already crashed or was closed
+        _POWERPOINT_APP = None
+
+atexit.register(quit_word_app)
+atexit.register(quit_powerpoint_app)
+
 def extract_text_from_pdf(file_path: str) -> str:
     """Extract text from PDF, using OCR if needed"""
     try:
         # Try pdfplumber first (for digital PDFs)
         with pdfplumber.open(file_path) as pdf:
-            text = ""
-            for page in pdf.pages:
+            parts = []
+            for i, page in enumerate(pdf.pages):
                 page_text = page.extract_text() or ""
                 if page_text.strip():
-                    text += page_text + "\n\n"
+                    parts.append(page_text)
+                elif not parts and i + 1 >= SCANNED_PDF_PROBE_PAGES:
+                    # No text on the first pages, don't parse the rest
+                    break
             
             # If no text was extracted, PDF might be scanned - use OCR
-            if not text.strip():
+            if not parts:
                 logger.info(f"PDF appears to be scanned, using OCR: {file_path}")
-                images = convert_from_path(file_path)
-                for img in images:
-                    text += pytesseract.image_to_string(img, lang='fra+eng') + "\n\n"
+                return ocr_pdf(file_path, len(pdf.pages))
             
-            return text
+            return "\n\n".join(parts)
     except Exception as e:
         logger.error(f"Error extracting text from PDF {file_path}: {str(e)}")
         return ""
 
+def ocr_images(images: List["Image.Image"]) -> List[str]:
+    """Extract text from several PIL images using OCR"""
+    if len(images) <= 1 or get_tesseract_api() is not None:
+        return [ocr_image(img) for img in images]
+    
+    # Run tesseract once on a multi-page TIFF rather than once per image,
+    # pages are separated by form feeds in the output
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tiff_path = os.path.join(tmp_dir, "pages.tif")
+        images[0].save(tiff_path, save_all=True, append_images=images[1:], compression='tiff_lzw')
+        text = pytesseract.image_to_string(tiff_path, lang='fra+eng')
+    return text.split('\x0c')[:len(images)]
+
+def render_pdf_pages(file_path: str, first_page: int, last_page: int) -> List["Image.Image"]:
+    """Render a range of PDF pages to images for OCR"""
+    return convert_from_path(file_path, dpi=OCR_DPI, grayscale=True,
+                             first_page=first_page, last_page=last_page)
+
+def ocr_pdf_page(task: Tuple[str, int]) -> str:
+    """Render a single PDF page and extract its text using OCR"""
+    file_path, page_number = task
+    return "".join(ocr_image(img) for img in render_pdf_pages(file_path, page_number, page_number))
+
+def ocr_pdf(file_path: str, num_pages: int) -> str:
+    """Extract text from a scanned PDF using OCR, one process per page when possible"""
+    if num_pages == 0:
+        return ""
+    workers = min(OCR_PAGE_WORKERS, num_pages)
+    
+    # Pool workers are daemonic and cannot start processes of their own
+    if workers <= 1 or multiprocessing.current_process().daemon:
+        # Render the next batch of pages in a thread while the current one is
+        # OCRed, only two batches are held in memory at a time
+        batches = [(first_page, min(first_page + OCR_BATCH_PAGES - 1, num_pages))
+                   for first_page in range(1, num_pages + 1, OCR_BATCH_PAGES)]
+        parts = []
+        with ThreadPoolExecutor(max_workers=1) as renderer:
+            next_images = renderer.submit(render_pdf_pages, file_path, *batches[0])
+            for i in range(len(batches)):
+                images = next_images.result()
+                if i + 1 < len(batches):
+                    next_images = renderer.submit(render_pdf_pages, file_path, *batches[i + 1])
+                parts.extend(ocr_images(images))
+        return "\n\n".join(parts)
+    
+    # Pages are rendered in the workers to avoid pickling large images
+    tasks = [(file_path, page_number) for page_number in range(1, num_pages + 1)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return "\n\n".join(executor.map(ocr_pdf_page, tasks))
+
 def extract_text_from_image(file_path: str) -> str:
     """Extract text from image using OCR"""
     try:
         img = Image.open(file_path)
-        text = pytesseract.image_to_string(img, lang='fra+eng')
+        
+        # Grayscale and downscale large scans (e.g. phone photos) before OCR;
+        # JPEG files are decoded directly in grayscale at a reduced scale
+        img.draft('L', (OCR_MAX_IMAGE_SIZE, OCR_MAX_IMAGE_SIZE))
+        
+        # Flatten transparent images (PNG/GIF) onto white, converting them
+        # directly would turn transparent backgrounds black
+        if 'A' in img.getbands() or (img.mode == 'P' and 'transparency' in img.info):
+            img = img.convert('RGBA')
+            img = Image.alpha_composite(Image.new('RGBA', img.size, (255, 255, 255, 255)), img)
+        
+        if img.mode != 'L':
+            img = img.convert('L')
+        if max(img.size) > OCR_MAX_IMAGE_SIZE:
+            img.thumbnail((OCR_MAX_IMAGE_SIZE, OCR_MAX_IMAGE_SIZE), Image.Resampling.LANCZOS)
+        
+        text = ocr_image(img)
         return text
     except Exception as e:
         logger.error(f"Error extracting text from image {file_path}: {str(e)}")
@@ -95,6 +317,26 @@ def extract_text_from_image(file_path: str) -> str:
 def extract_text_from_docx(file_path: str) -> str:
     """Extract text from .docx file"""
     try:
+        # Stream the document body, without docx2txt's DOM parse
+        try:
+            parts = []
+            with zipfile.ZipFile(file_path) as docx, docx.open('word/document.xml') as f:
+                for _, el in ET.iterparse(f, events=('end',)):
+                    if el.tag == _W_TEXT:
+                        if el.text:
+                            parts.append(el.text)
+                    elif el.tag == _W_TAB:
+                        parts.append('\t')
+                    elif el.tag == _W_PARAGRAPH:
+                        # Blank line between paragraphs, like docx2txt
+                        parts.append('\n\n')
+                    elif el.tag in _W_BREAKS:
+                        parts.append('\n')
+                    el.clear()
+            return ''.join(parts)
+        except Exception as e:
+            logger.warning(f"Streaming parse failed for {file_path}, using docx2txt: {str(e)}")
+        
         text = docx2txt.process(file_path)
         return text
     except Exception as e:
@@ -114,15 +356,15 @@ def extract_text_from_doc(file_path: str) -> str:
         # Try win32com if Office is installed
         if OFFICE_INSTALLED:
             try:
-                word = win32com.client.Dispatch("Word.Application")
-                word.Visible = False
-                doc = word.Documents.Open(os.path.abspath(file_path))
-                text = doc.Content.Text
-                doc.Close()
-                word.Quit()
-                return text
+                doc = get_word_app().Documents.Open(os.path.abspath(file_path))
+                try:
+                    return doc.Content.Text
+                finally:
+                    doc.Close()
             except Exception as e:
                 logger.warning(f"Win32com failed for {file_path}: {str(e)}")
+                # Word may have crashed, start a new instance for the next file
+                quit_word_app()
         
         logger.error(f"Failed to extract text from DOC {file_path} with all methods")
         return ""
@@ -133,13 +375,13 @@ def extract_text_from_doc(file_path: str) -> str:
 def extract_text_from_pptx(file_path: str) -> str:
     """Extract text from .pptx file"""
     try:
-        text = ""
+        parts = []
         prs = Presentation(file_path)
         for slide in prs.slides:
             for shape in slide.shapes:
                 if hasattr(shape, "text"):
-                    text += shape.text + "\n\n"
-        return text
+                    parts.append(shape.text)
+        return "\n\n".join(parts)
     except Exception as e:
         logger.error(f"Error extracting text from PPTX {file_path}: {str(e)}")
         return ""
@@ -157,19 +399,22 @@ def extract_text_from_ppt(file_path: str) -> str:
         # Try win32com if Office is installed
         if OFFICE_INSTALLED:
             try:
-                ppt = win32com.client.Dispatch("PowerPoint.Application")
-                presentation = ppt.Presentations.Open(os.path.abspath(file_path), WithWindow=False)
-                text = ""
-                for slide in presentation.Slides:
-                    for shape in slide.Shapes:
-                        if shape.HasTextFrame:
-                            if shape.TextFrame.HasText:
-                                text += shape.TextFrame.TextRange.Text + "\n\n"
-                presentation.Close()
-                ppt.Quit()
-                return text
+                presentation = get_powerpoint_app().Presentations.Open(os.path.abspath(file_path), WithWindow=False)
+                try:
+                    parts = []
+                    for slide in presentation.Slides:
+                        for shape in slide.Shapes:
+                            if shape.HasTextFrame:
+                                if shape.TextFrame.HasText:
+                                    parts.append(shape.TextFrame.TextRange.Text)
+                    return "\n\n".join(parts)
+                finally:
+                    presentation.Close()
             except Exception as e:
                 logger.warning(f"Win32com failed for {file_path}: {str(e)}")
+                # PowerPoint may have crashed, attach again for the next file.
+                # Don't quit it, other workers may be reading presentations
+                reset_powerpoint_app()
         
         logger.error(f"Failed to extract text from PPT {file_path} with all methods")
         return ""
@@ -179,29 +424,27 @@ def extract_text_from_ppt(file_path: str) -> str:
 
 def clean_text(text: str) -> str:
     """Clean extracted text"""
-    # Replace multiple spaces with a single space
-    text = re.sub(r'\s+', ' ', text)
+    # Split into paragraphs and replace multiple spaces with a single space
+    # inside each one (str.split/join is much faster than a regex)
+    paragraphs = (' '.join(paragraph.split()) for paragraph in _RE_NL.split(text))
     
     # Normalize line breaks
-    text = re.sub(r'\n\s*\n+', '\n\n', text)
+    text = '\n\n'.join(paragraph for paragraph in paragraphs if paragraph)
     
     # Remove control characters
-    text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', text)
+    text = _RE_CTRL.sub('', text)
     
-    # Remove page numbers (various formats)
-    text = re.sub(r'\n\s*\d+\s*\n', '\n', text)  # Page numbers on separate lines
-    text = re.sub(r'\b[Pp]age\s*\d+\s*of\s*\d+\b', '', text)  # "Page X of Y"
-    text = re.sub(r'\b[Pp]age\s*\d+\b', '', text)  # "Page X"
+    # Remove page numbers (various formats) in a single pass
+    text = _RE_PAGES.sub(lambda m: '\n' if m.group(1) else '', text)
     
     return text.strip()
 
-def get_metadata_from_path(file_path: str, input_dir: str) -> Dict[str, str]:
-    """Extract metadata from file path based on directory structure"""
-    rel_path = os.path.relpath(file_path, input_dir)
-    parts = Path(rel_path).parts
+def get_metadata_from_path(rel_path: str, file_name: str) -> Dict[str, str]:
+    """Extract metadata from file path (relative to the input directory) based on directory structure"""
+    parts = rel_path.split(os.sep)
     
     metadata = {
-        "Fichier source": os.path.basename(file_path)
+        "Fichier source": file_name
     }
     
     # Extract year, module and type based on directory structure
@@ -209,40 +452,64 @@ def get_metadata_from_path(file_path: str, input_dir: str) -> Dict[str, str]:
         metadata["Année"] = parts[0]
     if len(parts) >= 2:
         metadata["Module"] = parts[1]
-    if len(parts) >= 3 and parts[-1] != os.path.basename(file_path):
+    if len(parts) >= 3 and parts[-1] != file_name:
         metadata["Type"] = parts[2]
     
     return metadata
 
-def create_yaml_header(metadata: Dict[str, str]) -> str:
-    """Create YAML header from metadata"""
-    yaml_header = "---\n"
-    for key, value in metadata.items():
-        yaml_header += f"{key}: {value}\n"
-    yaml_header += "---\n\n"
-    return yaml_header
+def create_yaml_header(metadata: Dict[str, str]) -> bytes:
+    """Create YAML header from metadata, encoded in UTF-8"""
+    lines = ["---"]
+    lines += [f"{key}: {value}" for key, value in metadata.items()]
+    lines += ["---", "", ""]
+    return "\n".join(lines).encode('utf-8')
+
+# Text extractor for each supported file extension
+EXTRACTORS = {
+    '.pdf': extract_text_from_pdf,
+    '.jpg': extract_text_from_image,
+    '.jpeg': extract_text_from_image,
+    '.png': extract_text_from_image,
+    '.tiff': extract_text_from_image,
+    '.tif': extract_text_from_image,
+    '.bmp': extract_text_from_image,
+    '.gif': extract_text_from_image,
+    '.docx': extract_text_from_docx,
+    '.doc': extract_text_from_doc,
+    '.pptx': extract_text_from_pptx,
+    '.ppt': extract_text_from_ppt,
+}
+SUPPORTED_EXTENSIONS = frozenset(EXTRACTORS)
+OCR_EXTENSIONS = frozenset(ext for ext, extractor in EXTRACTORS.items()
+                           if extractor in (extract_text_from_pdf, extract_text_from_image))
 
-def process_file(file_path: str, input_dir: str, output_dir: str) -> bool:
+def process_file(file_path: str, input_dir: str, output_dir: str, file_ext: Optional[str] = None,
+                 force: bool = False) -> bool:
     """Process a single file and save the extracted text"""
     try:
-        file_ext = os.path.splitext(file_path)[1].lower()
+        file_name = os.path.basename(file_path)
+        if file_ext is None:
+            file_ext = os.path.splitext(file_name)[1].lower()
         
-        # Extract text based on file extension
-        if file_ext in ['.pdf']:
-            text = extract_text_from_pdf(file_path)
-        elif file_ext in ['.jpg', '.jpeg', '.png', '.tiff', '.tif', '.bmp', '.gif']:
-            text = extract_text_from_image(file_path)
-        elif file_ext in ['.docx']:
-            text = extract_text_from_docx(file_path)
-        elif file_ext in ['.doc']:
-            text = extract_text_from_doc(file_path)
-        elif file_ext in ['.pptx']:
-            text = extract_text_from_pptx(file_path)
-        elif file_ext in ['.ppt']:
-            text = extract_text_from_ppt(file_path)
+        # Prepare output path (maintaining directory structure)
+        if input_dir.endswith(os.sep) and file_path.startswith(input_dir):
+            rel_path = file_path[len(input_dir):]
         else:
+            rel_path = os.path.relpath(file_path, input_dir)
+        output_path = os.path.join(output_dir, rel_path[:len(rel_path) - len(file_ext)] + '.txt')
+        
+        # Skip files already extracted since their last modification
+        if (not force and os.path.exists(output_path)
+                and os.path.getmtime(output_path) >= os.path.getmtime(file_path)):
+            logger.info(f"Already up to date, skipping: {file_path}")
+            return True
+        
+        # Extract text based on file extension
+        extractor = EXTRACTORS.get(file_ext)
+        if extractor is None:
             logger.warning(f"Unsupported file type: {file_path}")
             return False
+        text = extractor(file_path)
         
         # Clean the extracted text
         cleaned_text = clean_text(text)
@@ -252,17 +519,29 @@ def process_file(file_path: str, input_dir: str, output_dir: str) -> bool:
             return False
         
         # Get metadata and create YAML header
-        metadata = get_metadata_from_path(file_path, input_dir)
+        metadata = get_metadata_from_path(rel_path, file_name)
         yaml_header = create_yaml_header(metadata)
         
-        # Prepare output path (maintaining directory structure)
-        rel_path = os.path.relpath(file_path, input_dir)
-        output_path = os.path.join(output_dir, os.path.splitext(rel_path)[0] + '.txt')
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         
-        # Write text with YAML header to output file
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(yaml_header + cleaned_text)
+        # Write text with YAML header to output file (encoded once, without
+        # going through a text-mode wrapper or copying the text to prepend
+        # the header). The file is written under a unique temporary name and
+        # then renamed, so an interrupted run never leaves a truncated output
+        # that looks up to date, and sources sharing a stem (e.g. X.pdf and
+        # X.docx) never write into the same temporary file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(output_path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb', buffering=OUTPUT_BUFFER_SIZE) as f:
+                f.write(yaml_header)
+                f.write(cleaned_text.encode('utf-8'))
+            # mkstemp creates the file readable by its owner only
+            os.chmod(tmp_path, 0o666 & ~_UMASK)
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
         
         logger.info(f"Successfully processed: {file_path}")
         return True
@@ -272,48 +551,80 @@ def process_file(file_path: str, input_dir: str, output_dir: str) -> bool:
         logger.debug(traceback.format_exc())
         return False
 
-def process_directory(input_dir: str, output_dir: str) -> Tuple[int, int]:
+def process_file_task(task: Tuple[str, str, str, str, bool]) -> bool:
+    """Process a (file_path, input_dir, output_dir, file_ext, force) task in a worker process"""
+    return process_file(*task)
+
+def iter_supported_files(directory: str) -> Iterator[Tuple[str, str]]:
+    """Yield (file_path, file_ext) for all supported files in a directory, recursively"""
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from iter_supported_files(entry.path)
+                else:
+                    file_ext = os.path.splitext(entry.name)[1].lower()
+                    if file_ext in SUPPORTED_EXTENSIONS:
+                        yield entry.path, file_ext
+    except OSError as e:
+        logger.warning(f"Cannot read directory {directory}: {str(e)}")
+
+def process_directory(input_dir: str, output_dir: str, workers: Optional[int] = None,
+                      force: bool = False) -> Tuple[int, int]:
     """Process all files in the input directory recursively"""
-    success_count = 0
-    fail_count = 0
+    # Tesseract already uses several threads internally, so use half the cores
+    if workers is None:
+        workers = max(1, (os.cpu_count() or 1) // 2)
     
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
     
-    # Supported file extensions
-    supported_extensions = [
-        '.pdf', '.jpg', '.jpeg', '.png', '.tiff', '.tif', '.bmp', '.gif',
-        '.docx', '.doc', '.pptx', '.ppt'
+    # Normalize the input directory once so that relative paths can be taken
+    # by stripping it from the start of the file paths
+    input_dir = os.path.abspath(input_dir).rstrip(os.sep) + os.sep
+    
+    # Walk through the directory tree and collect the files to process
+    tasks = [
+        (file_path, input_dir, output_dir, file_ext, force)
+        for file_path, file_ext in iter_supported_files(input_dir)
     ]
     
-    # Walk through the directory tree
-    for root, _, files in os.walk(input_dir):
-        for file in files:
-            file_path = os.path.join(root, file)
-            file_ext = os.path.splitext(file)[1].lower()
-            
-            if file_ext in supported_extensions:
-                if process_file(file_path, input_dir, output_dir):
-                    success_count += 1
-                else:
-                    fail_count += 1
+    # Files are independent, process them in parallel. A single file is
+    # processed in this process, where scanned PDFs can use the page pool
+    workers = min(workers, len(tasks))
+    if workers <= 1:
+        results = [process_file_task(task) for task in tasks]
+    else:
+        file_exts = frozenset(task[3] for task in tasks)
+        with multiprocessing.Pool(workers, initializer=init_worker, initargs=(file_exts,)) as pool:
+            results = list(pool.imap_unordered(process_file_task, tasks))
+            # Let the workers exit cleanly instead of being terminated
+            pool.close()
+            pool.join()
+    
+    success_count = sum(1 for ok in results if ok)
+    fail_count = len(results) - success_count
     
     return success_count, fail_count
 
 
-input_dir = "C:/Users/INFO STOCK 2022/OneDrive/Bureau/Project Medecine/Annales" 
-output_dir = "C:/Users/INFO STOCK 2022/OneDrive/Bureau/S6/Textes_Extraits_Annales" 
-
-# Lancer l'extraction directement
-logger.info(f"Starting text extraction from {input_dir} to {output_dir}")
-
-# Check if input directory exists
-if not os.path.isdir(input_dir):
-    logger.error(f"Input directory does not exist: {input_dir}")
-    print(f"Le dossier d'entrée n'existe pas: {input_dir}")
-else:
-    # Process all files
-    success_count, fail_count = process_directory(input_dir, output_dir)
+if __name__ == "__main__":
+    setup_logging()
+    
+    args = setup_argparse()
+    input_dir = args.input_dir
+    output_dir = args.output_dir
     
-    logger.info(f"Extraction complete. Successfully processed: {success_count}, Failed: {fail_count}")
-    print(f"Extraction terminée. Fichiers traités avec succès: {success_count}, Échecs: {fail_count}")
+    # Lancer l'extraction directement
+    logger.info(f"Starting text extraction from {input_dir} to {output_dir}")
+    
+    # Check if input directory exists
+    if not os.path.isdir(input_dir):
+        logger.error(f"Input directory does not exist: {input_dir}")
+        print(f"Le dossier d'entrée n'existe pas: {input_dir}")
+    else:
+        # Process all files
+        success_count, fail_count = process_directory(input_dir, output_dir, force=args.force)
+        
+        logger.info(f"Extraction complete. Successfully processed: {success_count}, Failed: {fail_count}")
+        print(f"Extraction terminée. Fichiers traités avec succès: {success_count}, Échecs: {fail_count}")